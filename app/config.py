@@ -3,40 +3,47 @@ Configuration module for the Agentic Honeypot API.
 Loads environment variables and provides settings.
 """
 
-import os
-from typing import Optional
+from functools import lru_cache
 from pydantic_settings import BaseSettings
-from dotenv import load_dotenv
-
-# Load environment variables from .env file
-load_dotenv()
 
 
 class Settings(BaseSettings):
-    """Application settings loaded from environment variables."""
+    """
+    Application settings loaded from environment variables.
+    
+    Values are read once by pydantic-settings from the environment
+    (field names map to upper-case variables, e.g. api_key -> API_KEY)
+    and from the .env file.
+    """
     
     # API Authentication
-    api_key: str = os.getenv("API_KEY", "honeypot-secret-key")
+    api_key: str = "honeypot-secret-key"
     
     # OpenAI API Key
-    openai_api_key: str = os.getenv("OPENAI_API_KEY", "")
+    openai_api_key: str = ""
     
     # Callback URL for final results
-    callback_url: str = os.getenv(
-        "CALLBACK_URL", 
-        "https://hackathon.guvi.in/api/updateHoneyPotFinalResult"
-    )
+    callback_url: str = "https://hackathon.guvi.in/api/updateHoneyPotFinalResult"
     
     # Logging
-    log_level: str = os.getenv("LOG_LEVEL", "INFO")
+    log_level: str = "INFO"
     
     # Server Settings
-    host: str = os.getenv("HOST", "0.0.0.0")
-    port: int = int(os.getenv("PORT", "8000"))
+    host: str = "0.0.0.0"
+    port: int = 8000
     
     # Session Management
     min_messages_for_callback: int = 8
     max_messages_for_callback: int = 15
+    max_sessions: int = 10_000  # Least recently used sessions are evicted beyond this
+    session_ttl_seconds: int = 3600  # Sessions idle for longer are dropped
+    
+    # AI Agent
+    response_cache_size: int = 2048  # LLM completions kept in the in-process LRU
+    prompt_history_budget_tokens: int = 6000  # Rough cap on history kept per session and sent to the LLM
+    
+    # Intelligence Extraction
+    extract_offload_chars: int = 16_384  # Longer messages are scanned in a worker process
     
     # Scam Detection
     scam_threshold: int = 40  # Score threshold for flagging as scam
@@ -46,5 +53,11 @@ class Settings(BaseSettings):
         extra = "ignore"
 
 
+@lru_cache(maxsize=1)
+def get_settings() -> Settings:
+    """Get the cached application settings instance."""
+    return Settings()
+
+
 # Global settings instance
-settings = Settings()
+settings = get_settings()
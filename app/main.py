@@ -0,0 +1,37 @@
+"""
+FastAPI application for the Agentic Honeypot API.
+"""
+
+from contextlib import asynccontextmanager
+from fastapi import FastAPI
+from fastapi.responses import ORJSONResponse
+from app.routers import scam_detection
+from app.services.callback_service import callback_service
+from app.services.intelligence_extractor import intelligence_extractor
+from app.services.session_manager import session_manager
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Start background work; release shared resources on shutdown."""
+    session_manager.start_sweeper()
+    await intelligence_extractor.start()
+    yield
+    await session_manager.aclose()
+    await callback_service.aclose()
+    intelligence_extractor.shutdown()
+
+
+app = FastAPI(
+    title="Agentic Honeypot API",
+    default_response_class=ORJSONResponse,
+    lifespan=lifespan
+)
+
+app.include_router(scam_detection.router)
+
+
+@app.get("/health")
+async def health():
+    """Health check endpoint."""
+    return {"status": "healthy"}
@@ -1,87 +1,38 @@
 """
 Pydantic models for request/response validation.
-Flexible to accept various input formats from hackathon.
+Incoming request bodies are parsed by hand in the router to accept
+various input formats from hackathon.
 """
 
-from typing import List, Optional, Dict, Any, Union
-from pydantic import BaseModel, Field, field_validator
+import time
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Set
+from pydantic import BaseModel, Field, field_serializer
 from datetime import datetime
+from app.utils.patterns import empty_keyword_matches
 
 
-class Message(BaseModel):
-    """Incoming message from the conversation."""
-    sender: str = Field(default="scammer", description="Sender identifier")
-    text: str = Field(..., description="Message content")
-    timestamp: Optional[str] = Field(default=None, description="ISO format timestamp")
-
-
-class Metadata(BaseModel):
-    """Metadata about the conversation context."""
-    channel: str = Field(default="sms", description="Communication channel")
-    language: str = Field(default="en", description="Message language")
-    locale: str = Field(default="en-IN", description="Locale for formatting")
-
-
-class ScamDetectionRequest(BaseModel):
+@dataclass(slots=True)
+class Message:
     """
-    Flexible request payload for scam detection endpoint.
-    Accepts various formats from hackathon tester.
-    """
-    # Try multiple field names for session ID
-    sessionId: Optional[str] = Field(default=None, description="Session ID")
-    session_id: Optional[str] = Field(default=None, description="Session ID (snake_case)")
-    
-    # Message can be a Message object OR just a string
-    message: Optional[Union[Message, str, Dict[str, Any]]] = Field(default=None)
-    text: Optional[str] = Field(default=None, description="Direct text field")
-    content: Optional[str] = Field(default=None, description="Content field")
-    
-    # Optional conversation history
-    conversationHistory: Optional[List[Message]] = Field(default_factory=list)
-    conversation_history: Optional[List[Dict]] = Field(default=None)
+    Message from the conversation.
     
-    # Optional metadata
-    metadata: Optional[Metadata] = Field(default_factory=Metadata)
-    
-    def get_session_id(self) -> str:
-        """Get session ID from various possible fields."""
-        return self.sessionId or self.session_id or f"session-{datetime.utcnow().timestamp()}"
-    
-    def get_message_text(self) -> str:
-        """Extract message text from various possible fields."""
-        # Direct text field
-        if self.text:
-            return self.text
-        if self.content:
-            return self.content
-        
-        # Message as string
-        if isinstance(self.message, str):
-            return self.message
-        
-        # Message as dict
-        if isinstance(self.message, dict):
-            return self.message.get("text", "") or self.message.get("content", "")
-        
-        # Message as Message object
-        if self.message and hasattr(self.message, "text"):
-            return self.message.text
-        
-        return ""
+    Built from request fields the router has already normalized, and
+    by the session manager for agent replies, so it skips validation.
+    """
+    sender: str = "scammer"  # Sender identifier
+    text: str = ""  # Message content
+    timestamp: Optional[str] = None  # ISO format timestamp
+    _text_lower: Optional[str] = field(
+        default=None, init=False, repr=False, compare=False
+    )
     
-    def get_message_object(self) -> Message:
-        """Get a proper Message object."""
-        text = self.get_message_text()
-        sender = "scammer"
-        timestamp = datetime.utcnow().isoformat()
-        
-        if isinstance(self.message, Message):
-            return self.message
-        elif isinstance(self.message, dict):
-            sender = self.message.get("sender", "scammer")
-            timestamp = self.message.get("timestamp", timestamp)
-        
-        return Message(sender=sender, text=text, timestamp=timestamp)
+    @property
+    def text_lower(self) -> str:
+        """Lowercased text, computed once and shared by all analyzers."""
+        if self._text_lower is None:
+            self._text_lower = self.text.lower()
+        return self._text_lower
 
 
 class ScamDetectionResponse(BaseModel):
@@ -92,11 +43,19 @@ class ScamDetectionResponse(BaseModel):
 
 class ExtractedIntelligence(BaseModel):
     """Intelligence extracted from the conversation."""
-    bankAccounts: List[str] = Field(default_factory=list)
-    upiIds: List[str] = Field(default_factory=list)
-    phishingLinks: List[str] = Field(default_factory=list)
-    phoneNumbers: List[str] = Field(default_factory=list)
-    suspiciousKeywords: List[str] = Field(default_factory=list)
+    bankAccounts: Set[str] = Field(default_factory=set)
+    upiIds: Set[str] = Field(default_factory=set)
+    phishingLinks: Set[str] = Field(default_factory=set)
+    phoneNumbers: Set[str] = Field(default_factory=set)
+    suspiciousKeywords: Set[str] = Field(default_factory=set)
+    
+    @field_serializer(
+        "bankAccounts", "upiIds", "phishingLinks",
+        "phoneNumbers", "suspiciousKeywords"
+    )
+    def _serialize_set(self, value: Set[str]) -> List[str]:
+        """Emit sets as sorted lists for stable JSON payloads."""
+        return sorted(value)
     
     def has_key_intelligence(self) -> bool:
         """Check if we have extracted key intelligence."""
@@ -105,14 +64,21 @@ class ExtractedIntelligence(BaseModel):
         return has_payment_info and has_contact_info
     
     def merge(self, other: "ExtractedIntelligence") -> "ExtractedIntelligence":
-        """Merge intelligence from another extraction."""
-        return ExtractedIntelligence(
-            bankAccounts=list(set(self.bankAccounts + other.bankAccounts)),
-            upiIds=list(set(self.upiIds + other.upiIds)),
-            phishingLinks=list(set(self.phishingLinks + other.phishingLinks)),
-            phoneNumbers=list(set(self.phoneNumbers + other.phoneNumbers)),
-            suspiciousKeywords=list(set(self.suspiciousKeywords + other.suspiciousKeywords))
-        )
+        """
+        Merge intelligence from another extraction into this one.
+        
+        Updates the sets in place, so merging a turn into a session costs
+        the size of the turn rather than of everything seen so far.
+        
+        Returns:
+            self, for chaining
+        """
+        self.bankAccounts.update(other.bankAccounts)
+        self.upiIds.update(other.upiIds)
+        self.phishingLinks.update(other.phishingLinks)
+        self.phoneNumbers.update(other.phoneNumbers)
+        self.suspiciousKeywords.update(other.suspiciousKeywords)
+        return self
 
 
 class CallbackPayload(BaseModel):
@@ -127,23 +93,43 @@ class CallbackPayload(BaseModel):
     )
 
 
-class SessionData(BaseModel):
-    """Internal session tracking data."""
+@dataclass(slots=True)
+class SessionData:
+    """
+    Internal session tracking data.
+    
+    A slotted dataclass rather than a Pydantic model: it never crosses
+    the API boundary and is read/written several times per request.
+    """
     session_id: str
-    created_at: datetime = Field(default_factory=datetime.utcnow)
-    message_count: int = 0
-    conversation_history: List[Message] = Field(default_factory=list)
-    extracted_intelligence: ExtractedIntelligence = Field(
+    created_at: datetime = field(default_factory=datetime.utcnow)
+    last_active: float = field(default_factory=time.monotonic)  # Monotonic time of last access
+    message_count: int = 0  # All messages so far, including dropped ones
+    # Recent messages only: turns beyond the prompt budget are rolled
+    # off, see SessionManager._append_message()
+    conversation_history: List[Message] = field(default_factory=list)
+    extracted_intelligence: ExtractedIntelligence = field(
         default_factory=ExtractedIntelligence
     )
     scam_detected: bool = False
     scam_score: int = 0
     callback_sent: bool = False
-    scammer_tactics: List[str] = Field(default_factory=list)
+    scammer_tactics: Set[str] = field(default_factory=set)
+    # Scam keywords matched so far, by category, so each turn only
+    # scans the new message
+    keyword_matches: Dict[str, Set[str]] = field(
+        default_factory=empty_keyword_matches
+    )
 
 
-class ScamDetectionResult(BaseModel):
-    """Result from scam detection analysis."""
+@dataclass(slots=True)
+class ScamDetectionResult:
+    """
+    Result from scam detection analysis.
+    
+    Built once per message by the detector and only read internally,
+    so it skips Pydantic validation.
+    """
     is_scam: bool
     confidence_score: int  # 0-100
     detected_keywords: List[str]
@@ -3,22 +3,20 @@ Scam detection router.
 Handles the /api/scam-detection endpoint.
 """
 
-from typing import List, Optional, Dict, Any
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
 import time
-from datetime import datetime
-from fastapi import APIRouter, Depends, BackgroundTasks, Request
+import orjson
+from fastapi import APIRouter, Depends, Request
+from fastapi.responses import ORJSONResponse, StreamingResponse
 from app.auth import verify_api_key
-from app.models import (
-    ScamDetectionRequest, 
-    ScamDetectionResponse,
-    Message
-)
+from app.models import Message, ScamDetectionResponse, SessionData
 from app.services.scam_detector import scam_detector
 from app.services.intelligence_extractor import intelligence_extractor
 from app.services.session_manager import session_manager
 from app.services.ai_agent import ai_agent
 from app.services.callback_service import callback_service
 from app.utils.logger import logger
+from app.utils.timestamps import utc_now_iso
 
 router = APIRouter(prefix="/api", tags=["scam-detection"])
 
@@ -31,20 +29,22 @@ async def detect_scam_head():
     return {"status": "ready"}
 
 
-@router.post("/scam-detection", response_model=ScamDetectionResponse)
-async def detect_scam(
-    request: Request,
-    background_tasks: BackgroundTasks,
-    api_key: str = Depends(verify_api_key)
-) -> ScamDetectionResponse:
+async def _read_body(request: Request) -> Dict[str, Any]:
+    """Parse the raw request body, treating anything but JSON as empty."""
+    try:
+        raw = await request.body()
+        return orjson.loads(raw) if raw else {}
+    except orjson.JSONDecodeError:
+        return {}
+
+
+def _parse_request(request_data: Dict[str, Any]) -> Tuple[str, Message, List[Message]]:
     """
-    Analyze incoming message. Accepts ANY request body.
+    Flexibly pull session ID, current message and history from a body.
+    
+    Returns:
+        Tuple of (session_id, message, history)
     """
-    try:
-        request_data = await request.json()
-    except Exception:
-        request_data = {}
-        
     # 1. Flexible parsing of Session ID
     session_id = request_data.get("sessionId") or request_data.get("session_id") or f"session-{int(time.time())}"
     
@@ -69,7 +69,7 @@ async def detect_scam(
     message = Message(
         sender="scammer",
         text=text,
-        timestamp=datetime.utcnow().isoformat()
+        timestamp=utc_now_iso()
     )
     
     # 3. Flexible parsing of History
@@ -79,33 +79,56 @@ async def detect_scam(
         if isinstance(item, dict):
             history.append(Message(
                 sender=item.get("sender", "user"), 
-                text=item.get("text", "") or item.get("content", ""),
+                text=item.get("text") or item.get("content") or "",
                 timestamp=item.get("timestamp")
             ))
     
-    logger.info(f"Processing message for session {session_id}: {text[:50]}...")
+    return session_id, message, history
+
+
+async def _analyze_turn(
+    session_id: str,
+    message: Message,
+    history: List[Message]
+) -> SessionData:
+    """
+    Detect, extract and record an incoming message; returns the session.
+    
+    Called with the session's lock held.
+    """
+    # Lazy %-formatting: nothing is built unless INFO is enabled
+    logger.info("Processing message for session %s: %.50s...", session_id, message.text)
     
-    # Step 1: Detect scam patterns
-    detection_result = scam_detector.analyze(message, history)
+    session = session_manager.get_or_create_session(session_id)
+    
+    # History from the request is only read on a session's first turn:
+    # later turns are already accumulated in the session. Decided after
+    # the lookup, which recreates an expired session empty
+    is_new = session.message_count == 0
+    
+    # Step 1: Detect scam patterns, adding to the session's running matches
+    detection_result = scam_detector.analyze(
+        message,
+        history if is_new else None,
+        session.keyword_matches
+    )
     
     # Step 2: Extract intelligence
-    intel = intelligence_extractor.extract(message)
+    intel = await intelligence_extractor.extract_async(message)
     
     # Also extract from history if provided
-    if history:
+    if history and is_new:
         history_intel = intelligence_extractor.extract_from_history(history)
-        intel = intel.merge(history_intel)
+        intel.merge(history_intel)
     
     # Step 3: Update session
-    tactics = []
-    if detection_result.impersonation_indicators:
-        tactics.extend(detection_result.impersonation_indicators)
-    if detection_result.threat_indicators:
-        tactics.append("threat_detected")
-    if detection_result.urgency_indicators:
-        tactics.append("urgency_tactics")
-    
-    session = session_manager.update_session(
+    tactics = [
+        *detection_result.impersonation_indicators,
+        *(("threat_detected",) if detection_result.threat_indicators else ()),
+        *(("urgency_tactics",) if detection_result.urgency_indicators else ())
+    ]
+    
+    return session_manager.update_session(
         session_id=session_id,
         message=message,
         intelligence=intel,
@@ -113,28 +136,95 @@ async def detect_scam(
         scam_score=detection_result.confidence_score,
         tactics=tactics
     )
+
+
+def _finish_turn(session_id: str, session: SessionData, response_text: str) -> None:
+    """
+    Record the agent's reply and fire the final callback when due.
     
-    # Step 4: Generate AI response
-    response_text = ai_agent.generate_response(message, session)
-    
-    # Add agent response to session
-    session_manager.add_agent_response(session_id, response_text)
+    Called with the session's lock held.
+    """
+    # Add agent response to session (nothing to add if a stream was cut
+    # off before its first chunk)
+    if response_text:
+        session_manager.add_agent_response(session_id, response_text)
     
     # Step 5: Check if we should trigger callback
     if session_manager.should_trigger_callback(session_id):
-        logger.info(f"Triggering callback for session {session_id}")
+        logger.info("Triggering callback for session %s", session_id)
         session_manager.mark_callback_sent(session_id)
         
         # Run callback in background to not block response
-        background_tasks.add_task(
-            callback_service.send_final_result,
-            session
-        )
-    
-    return ScamDetectionResponse(
-        status="success",
-        reply=response_text
-    )
+        callback_service.schedule_final_result(session)
+
+
+@router.post(
+    "/scam-detection",
+    responses={200: {"model": ScamDetectionResponse}}  # Documented, not enforced
+)
+async def detect_scam(
+    request: Request,
+    api_key: str = Depends(verify_api_key)
+) -> ORJSONResponse:
+    """
+    Analyze incoming message. Accepts ANY request body.
+    """
+    session_id, message, history = _parse_request(await _read_body(request))
+    
+    # Held for the whole turn, so a pipelined second message is analyzed
+    # and answered only once this one's reply is in the history
+    async with session_manager.lock(session_id):
+        session = await _analyze_turn(session_id, message, history)
+        
+        # Step 4: Generate AI response (awaited, so the event loop keeps
+        # serving other requests while the LLM call is in flight)
+        response_text = await ai_agent.generate_response(message, session)
+        
+        _finish_turn(session_id, session, response_text)
+    
+    # Plain response, no response_model re-validation
+    return ORJSONResponse({
+        "status": "success",
+        "reply": response_text
+    })
+
+
+@router.post("/scam-detection/stream")
+async def detect_scam_stream(
+    request: Request,
+    api_key: str = Depends(verify_api_key)
+) -> StreamingResponse:
+    """
+    Same as /scam-detection, but streams the reply as server-sent events.
+    
+    Each chunk arrives as `data: {"delta": ...}`; a final `done` event
+    carries the complete reply in the usual response shape.
+    """
+    session_id, message, history = _parse_request(await _read_body(request))
+    
+    async def events() -> AsyncIterator[bytes]:
+        # The whole turn runs under the session lock, as in detect_scam();
+        # taken inside the generator so it is released however the
+        # stream ends
+        async with session_manager.lock(session_id):
+            session = await _analyze_turn(session_id, message, history)
+            parts = []
+            try:
+                async for piece in ai_agent.generate_response_stream(message, session):
+                    parts.append(piece)
+                    yield b"data: " + orjson.dumps({"delta": piece}) + b"\n\n"
+            finally:
+                # Also runs when the client disconnects mid-stream,
+                # recording the part of the reply it was sent
+                response_text = "".join(parts)
+                _finish_turn(session_id, session, response_text)
+        
+        yield b"event: done\ndata: " + orjson.dumps({
+            "status": "success",
+            "reply": response_text
+        }) + b"\n\n"
+    
+    return StreamingResponse(events(), media_type="text/event-stream")
 
 
 @router.get("/session/{session_id}")
@@ -156,21 +246,25 @@ async def get_session_info(
     if not session:
         return {"error": "Session not found", "session_id": session_id}
     
-    return {
+    # Read the intelligence sets directly instead of model_dump(), and
+    # return an ORJSONResponse so the dict skips jsonable_encoder
+    return ORJSONResponse({
         "session_id": session.session_id,
         "message_count": session.message_count,
         "scam_detected": session.scam_detected,
         "scam_score": session.scam_score,
         "callback_sent": session.callback_sent,
-        "extracted_intelligence": session.extracted_intelligence.model_dump(),
-        "scammer_tactics": session.scammer_tactics
-    }
+        "extracted_intelligence": {
+            name: sorted(values)
+            for name, values in session.extracted_intelligence
+        },
+        "scammer_tactics": sorted(session.scammer_tactics)
+    })
 
 
 @router.post("/trigger-callback/{session_id}")
 async def manual_trigger_callback(
     session_id: str,
-    background_tasks: BackgroundTasks,
     api_key: str = Depends(verify_api_key)
 ):
     """
@@ -179,7 +273,6 @@ async def manual_trigger_callback(
     
     Args:
         session_id: Session identifier
-        background_tasks: FastAPI background tasks
         api_key: Validated API key
         
     Returns:
@@ -193,10 +286,7 @@ async def manual_trigger_callback(
         return {"error": "Callback already sent", "session_id": session_id}
     
     session_manager.mark_callback_sent(session_id)
-    background_tasks.add_task(
-        callback_service.send_final_result,
-        session
-    )
+    callback_service.schedule_final_result(session)
     
     return {
         "status": "callback_triggered",
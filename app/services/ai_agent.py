@@ -3,11 +3,16 @@ AI Agent service.
 Uses OpenAI GPT-4 to generate human-like responses that engage scammers.
 """
 
+import asyncio
 import random
-from typing import List, Optional
-from openai import OpenAI
+import re
+from collections import OrderedDict
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+import httpx
+from openai import AsyncOpenAI
 from app.config import settings
 from app.models import Message, SessionData
+from app.utils.patterns import build_keyword_automaton
 from app.utils.logger import logger
 
 
@@ -50,33 +55,111 @@ NEVER:
 - Give long, formal responses"""
 
     TYPO_WORDS = {
-        "problem": ["probem", "problm", "probelm"],
-        "account": ["acconut", "accont", "acount"],
-        "transfer": ["tranfer", "trasnfer", "trasfer"],
-        "payment": ["payemnt", "paymnt", "paymet"],
-        "please": ["plese", "pls", "plz"],
-        "understand": ["understnad", "undrestand", "undrstand"],
-        "message": ["messge", "mesage", "msg"],
-        "verification": ["verfication", "verifcation", "verificaton"],
-        "immediately": ["immediatly", "immedately", "immidiately"],
+        "problem": ("probem", "problm", "probelm"),
+        "account": ("acconut", "accont", "acount"),
+        "transfer": ("tranfer", "trasnfer", "trasfer"),
+        "payment": ("payemnt", "paymnt", "paymet"),
+        "please": ("plese", "pls", "plz"),
+        "understand": ("understnad", "undrestand", "undrstand"),
+        "message": ("messge", "mesage", "msg"),
+        "verification": ("verfication", "verifcation", "verificaton"),
+        "immediately": ("immediatly", "immedately", "immidiately"),
     }
     
-    HESITATION_PHRASES = [
+    # Screens replies for any typo-eligible word in one case-insensitive scan
+    TYPO_SCREEN = re.compile("|".join(TYPO_WORDS), re.IGNORECASE)
+    
+    HESITATION_PHRASES = (
         "Hmm...", "Wait...", "Let me think...", "But...",
         "I'm not sure...", "Actually...", "One moment...",
         "Let me see...", "Okay but..."
-    ]
+    )
+    
+    # Keyword triggers for the fallback buckets, in priority order
+    FALLBACK_BUCKET_KEYWORDS = {
+        "otp": ['otp', 'code', 'password', 'pin'],
+        "payment": ['transfer', 'send', 'pay', 'upi', 'money'],
+        "link": ['link', 'click', 'download', 'app'],
+        "threat": ['blocked', 'suspended', 'freeze', 'closed'],
+    }
+    FALLBACK_BUCKET_AUTOMATON = build_keyword_automaton(FALLBACK_BUCKET_KEYWORDS)
+    
+    # Response templates based on message content and stage
+    FALLBACK_RESPONSES = {
+        # Early stage - show concern and ask questions
+        "early": (
+            "What? My account has problem? What happened exactly?",
+            "Oh no, is there some issue with my bank account? Please explain simply.",
+            "What do you mean? I didn't do anything wrong. What is the matter?",
+            "Hello, I don't understand. Can you please explain what is happening?",
+        ),
+        # OTP/Password requests - stall
+        "otp": (
+            "OTP? You mean the number that comes on phone? Wait, let me check...",
+            "My son told me to never share these codes. Why do you need it?",
+            "But the message says not to share OTP with anyone. Are you sure this is safe?",
+            "Wait wait, the OTP is coming. Actually, can you tell me your name and employee ID first?",
+            "I am little confused. Which department are you from exactly?",
+        ),
+        # Payment requests - get their details
+        "payment": (
+            "Okay, but where should I send the money? What is your UPI ID?",
+            "I can transfer but what account number should I use? Please tell me slowly.",
+            "My son does all my transfers. Should I give him your number to call?",
+            "I am confused with all this. Can you give me a number where I can call you?",
+            "Transfer to where? Please give me the account details clearly.",
+        ),
+        # Link/App requests - ask questions
+        "link": (
+            "I don't know how to click links. Can you guide me step by step?",
+            "My phone is very old, sometimes links don't work. What is this link for?",
+            "Download app? What is the name? Maybe my son can help me install it.",
+            "Is this link safe? My grandson said to be careful with clicking links.",
+        ),
+        # Threat responses - show worry
+        "threat": (
+            "Blocked? But I just checked my balance yesterday! What happened?",
+            "Oh no no, please don't block it. All my pension money is there!",
+            "This is very worrying. Should I go to the bank branch directly?",
+            "Suspended? But why? I didn't do anything illegal. Please help me sir.",
+        ),
+        # Generic responses
+        "generic": (
+            "I am not understanding completely. Can you explain in simple words?",
+            "Okay, but what do I need to do exactly? Tell me step by step.",
+            "Actually, let me note down everything. What should I do first?",
+            "Is this really from the bank? How can I verify?",
+            "My wife is asking who is calling. What should I tell her?",
+        ),
+    }
+    
+    # Share of cache lookups skipped so cached replies keep some variety
+    CACHE_BYPASS_RATE = 0.1
+    
+    # Streamed deltas (roughly one token each) coalesced per chunk sent
+    STREAM_BATCH_TOKENS = 10
     
     def __init__(self):
+        # LRU cache of raw LLM completions, see _cache_key()
+        self._response_cache: "OrderedDict[Tuple[str, int, str], str]" = OrderedDict()
+        self.response_cache_size = settings.response_cache_size
+        # Completions in flight, shared by concurrent misses on the same key
+        self._inflight: Dict[Tuple[str, int, str], "asyncio.Task[Optional[str]]"] = {}
         self.client = None
         if settings.openai_api_key:
             try:
-                self.client = OpenAI(api_key=settings.openai_api_key)
+                # No SDK retries: on failure we answer from the fallback
+                # templates instead of keeping the scammer waiting
+                self.client = AsyncOpenAI(
+                    api_key=settings.openai_api_key,
+                    max_retries=0,
+                    timeout=httpx.Timeout(30.0, connect=5.0)
+                )
                 logger.info("OpenAI client initialized successfully")
             except Exception as e:
-                logger.error(f"Failed to initialize OpenAI client: {e}")
+                logger.error("Failed to initialize OpenAI client: %s", e)
     
-    def generate_response(
+    async def generate_response(
         self,
         current_message: Message,
         session: SessionData
@@ -95,37 +178,205 @@ NEVER:
             return self._generate_fallback_response(current_message, session)
         
         try:
-            # Build conversation history for OpenAI
-            messages = self._build_messages(current_message, session)
-            
-            response = self.client.chat.completions.create(
-                model="gpt-4o-mini",
-                max_tokens=150,
-                messages=messages
-            )
+            key = self._cache_key(current_message, session)
+            reply = None
+            if random.random() >= self.CACHE_BYPASS_RATE:
+                reply = self._cache_get(key)
             
-            reply = response.choices[0].message.content
+            if reply is None:
+                # Fresh completions already vary and carry the persona's
+                # typos, which the system prompt asks the model for
+                reply = await self._complete_shared(key, current_message, session)
+                if not reply:
+                    logger.warning("Empty completion, using fallback response")
+                    return self._generate_fallback_response(current_message, session)
+            else:
+                # Add human-like variations so reused replies still differ
+                reply = self._add_human_touches(reply)
             
-            # Add human-like variations
-            reply = self._add_human_touches(reply)
-            
-            logger.info(f"Generated AI response: {reply[:50]}...")
+            logger.info("Generated AI response: %.50s...", reply)
             return reply
             
         except Exception as e:
-            logger.error(f"OpenAI API error: {e}")
+            logger.error("OpenAI API error: %s", e)
             return self._generate_fallback_response(current_message, session)
     
+    async def generate_response_stream(
+        self,
+        current_message: Message,
+        session: SessionData
+    ) -> AsyncIterator[str]:
+        """
+        Stream a human-like response in chunks.
+        
+        Deltas are coalesced into batches of about STREAM_BATCH_TOKENS.
+        Joining the yielded chunks gives the full reply.
+        
+        Args:
+            current_message: The scammer's latest message
+            session: Current session data with history
+            
+        Yields:
+            Consecutive pieces of the response
+        """
+        if not self.client:
+            yield self._generate_fallback_response(current_message, session)
+            return
+        
+        key = self._cache_key(current_message, session)
+        if random.random() >= self.CACHE_BYPASS_RATE:
+            reply = self._cache_get(key)
+            if reply is not None:
+                yield self._add_human_touches(reply)
+                return
+        
+        parts: List[str] = []
+        pending: List[str] = []
+        sent_any = False
+        try:
+            stream = await self.client.chat.completions.create(
+                model="gpt-4o-mini",
+                max_tokens=150,
+                messages=self._build_messages(current_message, session),
+                stream=True
+            )
+            async for chunk in stream:
+                if not chunk.choices:
+                    continue
+                delta = chunk.choices[0].delta.content
+                if not delta:
+                    continue
+                parts.append(delta)
+                pending.append(delta)
+                
+                if len(pending) >= self.STREAM_BATCH_TOKENS:
+                    yield "".join(pending)
+                    sent_any = True
+                    pending.clear()
+        except Exception as e:
+            logger.error("OpenAI API error: %s", e)
+            if not sent_any:
+                yield self._generate_fallback_response(current_message, session)
+            return
+        
+        reply = "".join(parts)
+        if not reply:
+            yield self._generate_fallback_response(current_message, session)
+            return
+        self._cache_put(key, reply)
+        
+        if pending:
+            yield "".join(pending)
+        
+        logger.info("Streamed AI response: %.50s...", reply)
+    
+    async def _complete_shared(
+        self,
+        key: Tuple[str, int, str],
+        current_message: Message,
+        session: SessionData
+    ) -> Optional[str]:
+        """
+        Fetch a completion, joining one already in flight for the same key.
+        
+        A burst of turns that miss the cache with the same key (the same
+        opener sent to many sessions, say) makes one API call instead of
+        one each. The call runs as its own task, so a waiter that
+        disconnects doesn't cancel it for the rest.
+        """
+        task = self._inflight.get(key)
+        if task is None:
+            # Build conversation history for OpenAI
+            messages = self._build_messages(current_message, session)
+            task = asyncio.create_task(self._request_completion(key, messages))
+            self._inflight[key] = task
+            task.add_done_callback(lambda done: self._inflight_done(key, done))
+        return await asyncio.shield(task)
+    
+    async def _request_completion(
+        self,
+        key: Tuple[str, int, str],
+        messages: List[dict]
+    ) -> Optional[str]:
+        """Call the chat completions API and cache a non-empty reply."""
+        response = await self.client.chat.completions.create(
+            model="gpt-4o-mini",
+            max_tokens=150,
+            messages=messages
+        )
+        
+        reply = response.choices[0].message.content
+        if reply:
+            self._cache_put(key, reply)
+        return reply
+    
+    def _inflight_done(
+        self,
+        key: Tuple[str, int, str],
+        task: "asyncio.Task[Optional[str]]"
+    ) -> None:
+        """Forget a finished completion task."""
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        # Mark any error as retrieved even if every waiter went away
+        if not task.cancelled():
+            task.exception()
+    
+    def _cache_key(
+        self,
+        current_message: Message,
+        session: SessionData
+    ) -> Tuple[str, int, str]:
+        """
+        Fingerprint a turn for the response cache.
+        
+        Whitespace/case-normalized text, the conversation stage (in
+        buckets of 3 messages) and the fallback keyword bucket.
+        """
+        text = current_message.text_lower
+        normalized = " ".join(text.split())
+        bucket = self._classify_message(text, session.message_count)
+        return (normalized, session.message_count // 3, bucket)
+    
+    def _cache_get(self, key: Tuple[str, int, str]) -> Optional[str]:
+        """Look up a cached completion, marking it as recently used."""
+        reply = self._response_cache.get(key)
+        if reply is not None:
+            self._response_cache.move_to_end(key)
+            logger.info("Response cache hit")
+        return reply
+    
+    def _cache_put(self, key: Tuple[str, int, str], reply: str) -> None:
+        """Store a completion, evicting the least recently used beyond the limit."""
+        self._response_cache[key] = reply
+        self._response_cache.move_to_end(key)
+        if len(self._response_cache) > self.response_cache_size:
+            self._response_cache.popitem(last=False)
+    
     def _build_messages(
         self,
         current_message: Message,
         session: SessionData
     ) -> List[dict]:
-        """Build message list for OpenAI API."""
+        """
+        Build message list for OpenAI API.
+        
+        The list is prefix-stable across turns: the static SYSTEM_PROMPT
+        comes first, then the whole history oldest first, then the new
+        turn. Each request therefore extends the previous one, which lets
+        OpenAI's automatic prompt caching reuse the shared prefix. The
+        session manager keeps the history within the prompt budget, see
+        SessionManager._append_message().
+        """
         messages = [{"role": "system", "content": self.SYSTEM_PROMPT}]
         
+        # The session history normally already ends with the current message
+        history = session.conversation_history
+        if history and history[-1] is current_message:
+            history = history[:-1]
+        
         # Add conversation history
-        for msg in session.conversation_history[-10:]:  # Last 10 messages
+        for msg in history:
             role = "assistant" if msg.sender == "agent" else "user"
             messages.append({
                 "role": role,
@@ -146,6 +397,14 @@ NEVER:
         if random.random() < 0.2:
             text = random.choice(self.HESITATION_PHRASES) + " " + text
         
+        return self._add_typos(text)
+    
+    def _add_typos(self, text: str) -> str:
+        """Randomly misspell common words, as a hurried typist would."""
+        # Most replies contain no typo-eligible word; skip the per-word pass
+        if self.TYPO_SCREEN.search(text) is None:
+            return text
+        
         # Randomly add typos (15% chance per eligible word)
         words = text.split()
         for i, word in enumerate(words):
@@ -156,69 +415,39 @@ NEVER:
         
         return ' '.join(words)
     
+    def _classify_message(self, text: str, msg_count: int) -> str:
+        """
+        Pick the fallback bucket for a message.
+        
+        Args:
+            text: Lowercased message text
+            msg_count: Number of messages in the session so far
+            
+        Returns:
+            Key into FALLBACK_RESPONSES
+        """
+        if msg_count <= 2:
+            return "early"
+        
+        # One pass over the text finds every bucket it triggers
+        matched = set()
+        for _, (_, buckets) in self.FALLBACK_BUCKET_AUTOMATON.iter(text):
+            matched.update(buckets)
+        for bucket in self.FALLBACK_BUCKET_KEYWORDS:
+            if bucket in matched:
+                return bucket
+        return "generic"
+    
     def _generate_fallback_response(
         self,
         current_message: Message,
         session: SessionData
     ) -> str:
         """Generate a response when OpenAI API is unavailable."""
-        text = current_message.text.lower()
-        msg_count = session.message_count
-        
-        # Response templates based on message content and stage
-        if msg_count <= 2:
-            # Early stage - show concern and ask questions
-            responses = [
-                "What? My account has problem? What happened exactly?",
-                "Oh no, is there some issue with my bank account? Please explain simply.",
-                "What do you mean? I didn't do anything wrong. What is the matter?",
-                "Hello, I don't understand. Can you please explain what is happening?",
-            ]
-        elif any(kw in text for kw in ['otp', 'code', 'password', 'pin']):
-            # OTP/Password requests - stall
-            responses = [
-                "OTP? You mean the number that comes on phone? Wait, let me check...",
-                "My son told me to never share these codes. Why do you need it?",
-                "But the message says not to share OTP with anyone. Are you sure this is safe?",
-                "Wait wait, the OTP is coming. Actually, can you tell me your name and employee ID first?",
-                "I am little confused. Which department are you from exactly?",
-            ]
-        elif any(kw in text for kw in ['transfer', 'send', 'pay', 'upi', 'money']):
-            # Payment requests - get their details
-            responses = [
-                "Okay, but where should I send the money? What is your UPI ID?",
-                "I can transfer but what account number should I use? Please tell me slowly.",
-                "My son does all my transfers. Should I give him your number to call?",
-                "I am confused with all this. Can you give me a number where I can call you?",
-                "Transfer to where? Please give me the account details clearly.",
-            ]
-        elif any(kw in text for kw in ['link', 'click', 'download', 'app']):
-            # Link/App requests - ask questions
-            responses = [
-                "I don't know how to click links. Can you guide me step by step?",
-                "My phone is very old, sometimes links don't work. What is this link for?",
-                "Download app? What is the name? Maybe my son can help me install it.",
-                "Is this link safe? My grandson said to be careful with clicking links.",
-            ]
-        elif any(kw in text for kw in ['blocked', 'suspended', 'freeze', 'closed']):
-            # Threat responses - show worry
-            responses = [
-                "Blocked? But I just checked my balance yesterday! What happened?",
-                "Oh no no, please don't block it. All my pension money is there!",
-                "This is very worrying. Should I go to the bank branch directly?",
-                "Suspended? But why? I didn't do anything illegal. Please help me sir.",
-            ]
-        else:
-            # Generic responses
-            responses = [
-                "I am not understanding completely. Can you explain in simple words?",
-                "Okay, but what do I need to do exactly? Tell me step by step.",
-                "Actually, let me note down everything. What should I do first?",
-                "Is this really from the bank? How can I verify?",
-                "My wife is asking who is calling. What should I tell her?",
-            ]
-        
-        response = random.choice(responses)
+        bucket = self._classify_message(
+            current_message.text_lower, session.message_count
+        )
+        response = random.choice(self.FALLBACK_RESPONSES[bucket])
         return self._add_human_touches(response)
 
 
@@ -5,19 +5,99 @@ Handles posting final results to the hackathon API.
 
 import httpx
 import asyncio
-from typing import Optional
+import random
+from typing import List, Optional
 from app.models import CallbackPayload, SessionData
 from app.config import settings
 from app.utils.logger import logger
 
 
 class CallbackService:
-    """Service for sending final results to the hackathon API."""
+    """
+    Service for sending final results to the hackathon API.
+    
+    A single httpx.AsyncClient is shared by all callbacks so the
+    connection to the callback host is kept alive between sessions.
+    Callbacks scheduled from request handlers go onto a queue drained by
+    num_workers worker tasks, which also caps concurrent POSTs.
+    """
     
     def __init__(self):
         self.callback_url = settings.callback_url
         self.max_retries = 3
-        self.retry_delay = 1  # seconds
+        self.retry_delay = 1  # seconds, base for the backoff
+        self.max_retry_delay = 10  # seconds
+        self.num_workers = 16
+        self._client: Optional[httpx.AsyncClient] = None
+        self._queue: Optional["asyncio.Queue[SessionData]"] = None
+        self._workers: List[asyncio.Task] = []
+    
+    def _get_client(self) -> httpx.AsyncClient:
+        """Get the shared HTTP client, creating it on first use."""
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(
+                timeout=httpx.Timeout(30.0, connect=5.0),
+                limits=httpx.Limits(
+                    max_connections=200,
+                    max_keepalive_connections=50,
+                    keepalive_expiry=30.0
+                ),
+                headers={"Content-Type": "application/json"}
+            )
+        return self._client
+    
+    async def aclose(self) -> None:
+        """
+        Wait for queued callbacks, stop the workers and close the shared
+        HTTP client. Called on application shutdown.
+        """
+        if self._workers:
+            if self._queue.qsize():
+                logger.info("Waiting for %d queued callback(s)", self._queue.qsize())
+            await self._queue.join()
+            
+            for worker in self._workers:
+                worker.cancel()
+            await asyncio.gather(*self._workers, return_exceptions=True)
+            self._workers = []
+            self._queue = None
+        
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+    
+    def schedule_final_result(self, session: SessionData) -> None:
+        """
+        Queue the final callback to be sent in the background.
+        
+        Returns immediately, so the caller's response is not tied to
+        callback latency or retries.
+        """
+        if not self._workers:
+            self._start_workers()
+        self._queue.put_nowait(session)
+    
+    def _start_workers(self) -> None:
+        """Create the queue and worker tasks on the running event loop."""
+        self._queue = asyncio.Queue()
+        self._workers = [
+            asyncio.create_task(self._worker())
+            for _ in range(self.num_workers)
+        ]
+    
+    async def _worker(self) -> None:
+        """Send queued callbacks one at a time."""
+        while True:
+            session = await self._queue.get()
+            try:
+                await self.send_final_result(session)
+            except Exception as e:
+                logger.error(
+                    "Callback worker error for session %s: %s",
+                    session.session_id, e
+                )
+            finally:
+                self._queue.task_done()
     
     async def send_final_result(self, session: SessionData) -> bool:
         """
@@ -32,50 +112,58 @@ class CallbackService:
         payload = self._build_payload(session)
         
         logger.info(
-            f"Sending callback for session {session.session_id}: "
-            f"messages={payload.totalMessagesExchanged}, "
-            f"scam_detected={payload.scamDetected}"
+            "Sending callback for session %s: messages=%d, scam_detected=%s",
+            session.session_id, payload.totalMessagesExchanged,
+            payload.scamDetected
         )
         
+        # Serialize once, straight to JSON in pydantic-core without an
+        # intermediate dict, and reuse the bytes across retries
+        body = payload.model_dump_json().encode()
+        client = self._get_client()
+        delay = self.retry_delay
+        
         for attempt in range(1, self.max_retries + 1):
             try:
-                async with httpx.AsyncClient(timeout=30.0) as client:
-                    response = await client.post(
-                        self.callback_url,
-                        json=payload.model_dump(),
-                        headers={"Content-Type": "application/json"}
+                response = await client.post(self.callback_url, content=body)
+                
+                if response.status_code in [200, 201, 202]:
+                    logger.info(
+                        "Callback successful for session %s "
+                        "(attempt %d): status=%d",
+                        session.session_id, attempt, response.status_code
+                    )
+                    return True
+                else:
+                    logger.warning(
+                        "Callback failed for session %s "
+                        "(attempt %d): status=%d, response=%.200s",
+                        session.session_id, attempt, response.status_code,
+                        response.text
                     )
                     
-                    if response.status_code in [200, 201, 202]:
-                        logger.info(
-                            f"Callback successful for session {session.session_id} "
-                            f"(attempt {attempt}): status={response.status_code}"
-                        )
-                        return True
-                    else:
-                        logger.warning(
-                            f"Callback failed for session {session.session_id} "
-                            f"(attempt {attempt}): status={response.status_code}, "
-                            f"response={response.text[:200]}"
-                        )
-                        
             except httpx.TimeoutException:
                 logger.warning(
-                    f"Callback timeout for session {session.session_id} "
-                    f"(attempt {attempt})"
+                    "Callback timeout for session %s (attempt %d)",
+                    session.session_id, attempt
                 )
             except Exception as e:
                 logger.error(
-                    f"Callback error for session {session.session_id} "
-                    f"(attempt {attempt}): {e}"
+                    "Callback error for session %s (attempt %d): %s",
+                    session.session_id, attempt, e
                 )
             
-            # Wait before retry (exponential backoff)
+            # Wait before retry (decorrelated jitter backoff, so retries
+            # from many sessions after one hiccup don't fire in lockstep)
             if attempt < self.max_retries:
-                await asyncio.sleep(self.retry_delay * attempt)
+                delay = min(
+                    self.max_retry_delay,
+                    random.uniform(self.retry_delay, delay * 3)
+                )
+                await asyncio.sleep(delay)
         
         logger.error(
-            f"All callback attempts failed for session {session.session_id}"
+            "All callback attempts failed for session %s", session.session_id
         )
         return False
     
@@ -84,7 +172,8 @@ class CallbackService:
         # Generate agent notes summarizing the interaction
         agent_notes = self._generate_agent_notes(session)
         
-        return CallbackPayload(
+        # Every field comes from our own session state, so skip validation
+        return CallbackPayload.model_construct(
             sessionId=session.session_id,
             scamDetected=session.scam_detected,
             totalMessagesExchanged=session.message_count,
@@ -98,7 +187,7 @@ class CallbackService:
         
         # Detected tactics
         if session.scammer_tactics:
-            tactics_str = ", ".join(session.scammer_tactics[:10])  # Limit to 10
+            tactics_str = ", ".join(sorted(session.scammer_tactics)[:10])  # Limit to 10
             notes_parts.append(f"Detected tactics: {tactics_str}")
         
         # Scam score
@@ -3,11 +3,17 @@ Intelligence extraction service.
 Extracts bank accounts, UPI IDs, phone numbers, URLs, and keywords from messages.
 """
 
-from typing import List
+import asyncio
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional, Set
+from app.config import settings
 from app.models import ExtractedIntelligence, Message
 from app.utils.patterns import (
     BANK_ACCOUNT_PATTERN, UPI_ID_PATTERN, PHONE_PATTERN,
-    URL_PATTERN, SHORTENED_URL_PATTERN, SCAM_KEYWORDS
+    PHISHING_LINK_PATTERN, DIGIT_RUN_PATTERN,
+    EMAIL_DOMAIN_PATTERN, scan_keywords
 )
 from app.utils.logger import logger
 
@@ -16,7 +22,63 @@ class IntelligenceExtractor:
     """Service for extracting actionable intelligence from conversations."""
     
     def __init__(self):
-        self.scam_keywords = [kw.lower() for kw in SCAM_KEYWORDS]
+        self.offload_chars = settings.extract_offload_chars
+        self.workers = min(4, os.cpu_count() or 1)
+        self._pool: Optional[ProcessPoolExecutor] = None
+    
+    async def extract_async(self, message: Message) -> ExtractedIntelligence:
+        """
+        Extract intelligence without stalling the event loop on long texts.
+        
+        Regex extraction is pure Python and holds the GIL for tens of
+        milliseconds on a pasted multi-KB template, so messages longer than
+        settings.extract_offload_chars run in a worker process. Shorter ones
+        are extracted inline, where the hand-off would cost more than it saves.
+        
+        Args:
+            message: The message to analyze
+            
+        Returns:
+            ExtractedIntelligence with all detected items
+        """
+        if len(message.text) <= self.offload_chars:
+            return self.extract(message)
+        
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self._get_pool(), _extract_in_worker, message.text
+        )
+    
+    async def start(self) -> None:
+        """
+        Start the worker processes. Called on application startup.
+        
+        Spawning a worker and importing the extractor in it takes a few
+        hundred milliseconds, so every worker runs one empty extraction
+        here rather than on the first long message.
+        """
+        pool = self._get_pool()
+        loop = asyncio.get_running_loop()
+        await asyncio.gather(*(
+            loop.run_in_executor(pool, _extract_in_worker, "")
+            for _ in range(self.workers)
+        ))
+    
+    def shutdown(self) -> None:
+        """Stop the worker processes. Called on application shutdown."""
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+    
+    def _get_pool(self) -> ProcessPoolExecutor:
+        """Return the worker pool, creating it if start() hasn't."""
+        if self._pool is None:
+            # Spawned rather than forked: the server process has threads
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context("spawn")
+            )
+        return self._pool
     
     def extract(self, message: Message) -> ExtractedIntelligence:
         """
@@ -28,23 +90,18 @@ class IntelligenceExtractor:
         Returns:
             ExtractedIntelligence with all detected items
         """
-        text = message.text
-        
-        intel = ExtractedIntelligence(
-            bankAccounts=self._extract_bank_accounts(text),
-            upiIds=self._extract_upi_ids(text),
-            phoneNumbers=self._extract_phone_numbers(text),
-            phishingLinks=self._extract_urls(text),
-            suspiciousKeywords=self._extract_keywords(text)
-        )
+        buckets = self._new_buckets()
+        self.extract_raw(message.text, buckets, message.text_lower)
+        
+        # Buckets are already sets of strings, skip re-validation
+        intel = ExtractedIntelligence.model_construct(**buckets)
         
         logger.info(
-            f"Extracted intelligence: "
-            f"bank_accounts={len(intel.bankAccounts)}, "
-            f"upi_ids={len(intel.upiIds)}, "
-            f"phones={len(intel.phoneNumbers)}, "
-            f"urls={len(intel.phishingLinks)}, "
-            f"keywords={len(intel.suspiciousKeywords)}"
+            "Extracted intelligence: bank_accounts=%d, upi_ids=%d, "
+            "phones=%d, urls=%d, keywords=%d",
+            len(intel.bankAccounts), len(intel.upiIds),
+            len(intel.phoneNumbers), len(intel.phishingLinks),
+            len(intel.suspiciousKeywords)
         )
         
         return intel
@@ -59,20 +116,52 @@ class IntelligenceExtractor:
         Returns:
             Merged ExtractedIntelligence from all messages
         """
-        combined = ExtractedIntelligence()
-        
+        # Accumulate into shared sets and build a single model at the end
+        buckets = self._new_buckets()
         for msg in messages:
-            intel = self.extract(msg)
-            combined = combined.merge(intel)
+            self.extract_raw(msg.text, buckets, msg.text_lower)
         
-        return combined
+        return ExtractedIntelligence.model_construct(**buckets)
+    
+    def extract_raw(
+        self,
+        text: str,
+        buckets: Dict[str, Set[str]],
+        text_lower: Optional[str] = None
+    ) -> None:
+        """
+        Extract intelligence from text into existing buckets.
+        
+        Args:
+            text: The text to analyze
+            buckets: Sets keyed by ExtractedIntelligence field name,
+                updated in place
+            text_lower: Lowercased text, if the caller already has it
+        """
+        # Skip patterns that cannot match: most messages have no long digit
+        # run, '@' or URL, so this avoids several full regex passes
+        if DIGIT_RUN_PATTERN.search(text) is not None:
+            buckets["bankAccounts"].update(self._extract_bank_accounts(text))
+            buckets["phoneNumbers"].update(self._extract_phone_numbers(text))
+        if "@" in text:
+            buckets["upiIds"].update(self._extract_upi_ids(text))
+        if "/" in text:
+            buckets["phishingLinks"].update(self._extract_urls(text))
+        buckets["suspiciousKeywords"].update(
+            self._extract_keywords(text.lower() if text_lower is None else text_lower)
+        )
     
-    def _extract_bank_accounts(self, text: str) -> List[str]:
+    @staticmethod
+    def _new_buckets() -> Dict[str, Set[str]]:
+        """Create empty buckets for extract_raw()."""
+        return {name: set() for name in ExtractedIntelligence.model_fields}
+    
+    def _extract_bank_accounts(self, text: str) -> Set[str]:
         """Extract potential bank account numbers."""
         matches = BANK_ACCOUNT_PATTERN.findall(text)
         
         # Filter out likely non-account numbers
-        valid_accounts = []
+        valid_accounts = set()
         for match in matches:
             # Bank accounts typically have 9-18 digits
             # Filter out obvious non-accounts (phone numbers, PINs, etc.)
@@ -80,74 +169,60 @@ class IntelligenceExtractor:
                 # Avoid phone numbers (10 digits starting with 6-9)
                 if len(match) == 10 and match[0] in '6789':
                     continue
-                valid_accounts.append(match)
+                valid_accounts.add(match)
         
-        return list(set(valid_accounts))
+        return valid_accounts
     
-    def _extract_upi_ids(self, text: str) -> List[str]:
+    def _extract_upi_ids(self, text: str) -> Set[str]:
         """Extract UPI IDs."""
         matches = UPI_ID_PATTERN.findall(text)
         
-        # Validate UPI ID format
-        valid_upis = []
-        known_upi_handles = [
-            'paytm', 'ybl', 'sbi', 'okicici', 'okhdfcbank', 
-            'okaxis', 'oksbi', 'upi', 'apl', 'axisbank',
-            'ibl', 'icici', 'kotak', 'indus', 'hsbc'
-        ]
-        
+        # UPI_ID_PATTERN already guarantees '@' and a 2+ letter handle,
+        # which every known UPI handle satisfies; only emails need excluding
+        valid_upis = set()
         for match in matches:
-            # Check if it looks like a valid UPI ID
-            if '@' in match:
-                handle = match.split('@')[1].lower()
-                # Accept known handles or handles that look like bank names
-                if any(upi in handle for upi in known_upi_handles) or len(handle) >= 2:
-                    # Exclude email addresses
-                    if not any(domain in handle for domain in ['gmail', 'yahoo', 'hotmail', 'outlook', 'mail']):
-                        valid_upis.append(match)
-        
-        return list(set(valid_upis))
+            handle = match.split('@')[1]
+            if EMAIL_DOMAIN_PATTERN.search(handle) is None:
+                valid_upis.add(match)
+        
+        return valid_upis
     
-    def _extract_phone_numbers(self, text: str) -> List[str]:
+    def _extract_phone_numbers(self, text: str) -> Set[str]:
         """Extract Indian phone numbers."""
         matches = PHONE_PATTERN.findall(text)
         
         # Format consistently
-        formatted = []
+        formatted = set()
         for match in matches:
             # Ensure 10 digits starting with 6-9
             if len(match) == 10 and match[0] in '6789':
-                formatted.append(f"+91 {match}")
+                formatted.add(f"+91 {match}")
         
-        return list(set(formatted))
+        return formatted
     
-    def _extract_urls(self, text: str) -> List[str]:
+    def _extract_urls(self, text: str) -> Set[str]:
         """Extract URLs and potential phishing links."""
-        urls = URL_PATTERN.findall(text)
-        shortened = SHORTENED_URL_PATTERN.findall(text)
-        
-        all_urls = list(set(urls))
+        all_urls = set()
         
-        # Add shortened URLs with full protocol
-        for short in shortened:
-            if not short.startswith('http'):
-                all_urls.append(f"https://{short}")
-            else:
-                all_urls.append(short)
+        # One pass for both full URLs and shortened links
+        for match in PHISHING_LINK_PATTERN.finditer(text):
+            url = match.group()
+            # Add shortened URLs with full protocol
+            if not url.lower().startswith('http'):
+                url = f"https://{url}"
+            all_urls.add(url)
         
-        return list(set(all_urls))
+        return all_urls
     
-    def _extract_keywords(self, text: str) -> List[str]:
-        """Extract suspicious keywords found in the text."""
-        text_lower = text.lower()
-        found = []
-        
-        for keyword in self.scam_keywords:
-            if keyword in text_lower:
-                found.append(keyword)
-        
-        return list(set(found))
+    def _extract_keywords(self, text_lower: str) -> Set[str]:
+        """Extract suspicious keywords found in the lowercased text."""
+        return scan_keywords(text_lower)["scam"]
 
 
 # Global instance
 intelligence_extractor = IntelligenceExtractor()
+
+
+def _extract_in_worker(text: str) -> ExtractedIntelligence:
+    """Worker-process entry point for extract_async()."""
+    return intelligence_extractor.extract(Message(text=text))
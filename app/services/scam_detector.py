@@ -3,49 +3,50 @@ Scam detection service.
 Analyzes messages to detect scam patterns and score likelihood.
 """
 
-from typing import List, Tuple
+from typing import Dict, List, Optional, Set, Tuple
 from app.models import ScamDetectionResult, Message
-from app.utils.patterns import (
-    SCAM_KEYWORDS, BANK_NAMES, AUTHORITY_NAMES,
-    THREAT_KEYWORDS, URGENCY_KEYWORDS
-)
+from app.utils.patterns import scan_keywords
 from app.utils.logger import logger
 
 
 class ScamDetector:
     """Service for detecting scam patterns in messages."""
     
-    def __init__(self):
-        self.scam_keywords = [kw.lower() for kw in SCAM_KEYWORDS]
-        self.bank_names = [bn.lower() for bn in BANK_NAMES]
-        self.authority_names = [an.lower() for an in AUTHORITY_NAMES]
-        self.threat_keywords = [tk.lower() for tk in THREAT_KEYWORDS]
-        self.urgency_keywords = [uk.lower() for uk in URGENCY_KEYWORDS]
-    
-    def analyze(self, message: Message, history: List[Message] = None) -> ScamDetectionResult:
+    def analyze(
+        self,
+        message: Message,
+        history: List[Message] = None,
+        matches: Optional[Dict[str, Set[str]]] = None
+    ) -> ScamDetectionResult:
         """
         Analyze a message for scam indicators.
         
         Args:
             message: The message to analyze
             history: Previous messages in the conversation
+            matches: Keyword matches accumulated over the session, updated
+                in place. When given, the result covers every turn so far,
+                so history only needs passing for turns not yet scanned.
             
         Returns:
             ScamDetectionResult with detection details
         """
-        text = message.text.lower()
+        # Detect all indicators, scanning each message's cached lowercase
+        # text in turn rather than joining them into one string
+        found = scan_keywords(message.text_lower, matches)
         
         # Also analyze recent history for context
-        full_text = text
         if history:
-            recent_history = history[-5:]  # Look at last 5 messages
-            full_text += " " + " ".join([m.text.lower() for m in recent_history])
+            for past in history[-5:]:  # Look at last 5 messages
+                scan_keywords(past.text_lower, found)
         
-        # Detect various indicators
-        detected_keywords = self._detect_keywords(full_text)
-        urgency_indicators = self._detect_urgency(full_text)
-        impersonation_indicators = self._detect_impersonation(full_text)
-        threat_indicators = self._detect_threats(full_text)
+        detected_keywords = list(found["scam"])
+        urgency_indicators = list(found["urgency"])
+        impersonation_indicators = (
+            [f"Bank: {name.upper()}" for name in found["bank"]] +
+            [f"Authority: {name.upper()}" for name in found["authority"]]
+        )
+        threat_indicators = list(found["threat"])
         
         # Calculate confidence score
         score = self._calculate_score(
@@ -65,48 +66,12 @@ class ScamDetector:
         )
         
         logger.info(
-            f"Scam detection result: is_scam={result.is_scam}, "
-            f"score={result.confidence_score}, "
-            f"keywords={len(detected_keywords)}"
+            "Scam detection result: is_scam=%s, score=%d, keywords=%d",
+            result.is_scam, result.confidence_score, len(detected_keywords)
         )
         
         return result
     
-    def _detect_keywords(self, text: str) -> List[str]:
-        """Detect scam-related keywords in text."""
-        found = []
-        for keyword in self.scam_keywords:
-            if keyword in text:
-                found.append(keyword)
-        return list(set(found))
-    
-    def _detect_urgency(self, text: str) -> List[str]:
-        """Detect urgency indicators in text."""
-        found = []
-        for phrase in self.urgency_keywords:
-            if phrase in text:
-                found.append(phrase)
-        return list(set(found))
-    
-    def _detect_impersonation(self, text: str) -> List[str]:
-        """Detect impersonation of banks or authorities."""
-        found = []
-        for name in self.bank_names:
-            if name in text:
-                found.append(f"Bank: {name.upper()}")
-        for name in self.authority_names:
-            if name in text:
-                found.append(f"Authority: {name.upper()}")
-        return list(set(found))
-    
-    def _detect_threats(self, text: str) -> List[str]:
-        """Detect threatening language."""
-        found = []
-        for threat in self.threat_keywords:
-            if threat in text:
-                found.append(threat)
-        return list(set(found))
-    
     def _calculate_score(
         self,
         keywords: List[str],
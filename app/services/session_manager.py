@@ -3,18 +3,56 @@ Session management service.
 Tracks conversation state and extracted intelligence per session.
 """
 
+import asyncio
+import time
+from collections import OrderedDict, defaultdict
 from typing import Dict, Optional
 from datetime import datetime
 from app.models import SessionData, Message, ExtractedIntelligence
 from app.config import settings
 from app.utils.logger import logger
+from app.utils.timestamps import utc_now_iso
 
 
 class SessionManager:
-    """In-memory session storage and management."""
+    """
+    In-memory session storage and management.
+    
+    Sessions are kept in LRU order and the least recently used one is
+    evicted once more than settings.max_sessions are stored. Sessions
+    idle for longer than settings.session_ttl_seconds are dropped, on
+    access and by a periodic sweep.
+    
+    Each session also has an asyncio.Lock, see lock().
+    """
+    
+    # Seconds between sweeps for idle sessions
+    SWEEP_INTERVAL = 60
+    
+    # Rough characters-per-token ratio for budgeting session history
+    CHARS_PER_TOKEN = 4
     
     def __init__(self):
-        self._sessions: Dict[str, SessionData] = {}
+        self._sessions: "OrderedDict[str, SessionData]" = OrderedDict()
+        self.max_sessions = settings.max_sessions
+        self.session_ttl = settings.session_ttl_seconds
+        self.history_budget = (
+            settings.prompt_history_budget_tokens * self.CHARS_PER_TOKEN
+        )
+        self._sweeper: Optional[asyncio.Task] = None
+        self._locks: Dict[str, asyncio.Lock] = defaultdict(asyncio.Lock)
+    
+    def lock(self, session_id: str) -> asyncio.Lock:
+        """
+        Get the lock for a session.
+        
+        Held for a whole turn, from analyzing the incoming message to
+        recording the agent's reply, so pipelined messages to one session
+        are answered one at a time and each prompt sees the previous
+        reply. Other sessions carry on meanwhile. Locks of removed
+        sessions are dropped by the sweep.
+        """
+        return self._locks[session_id]
     
     def get_or_create_session(self, session_id: str) -> SessionData:
         """
@@ -26,18 +64,33 @@ class SessionManager:
         Returns:
             SessionData for the session
         """
-        if session_id not in self._sessions:
-            self._sessions[session_id] = SessionData(
+        session = self.get_session(session_id)
+        if session is None:
+            session = SessionData(
                 session_id=session_id,
                 created_at=datetime.utcnow()
             )
-            logger.info(f"Created new session: {session_id}")
+            self._sessions[session_id] = session
+            logger.info("Created new session: %s", session_id)
+            
+            if len(self._sessions) > self.max_sessions:
+                evicted_id, _ = self._sessions.popitem(last=False)
+                logger.info("Evicted least recently used session: %s", evicted_id)
         
-        return self._sessions[session_id]
+        return session
     
     def get_session(self, session_id: str) -> Optional[SessionData]:
-        """Get session if it exists."""
-        return self._sessions.get(session_id)
+        """Get session if it exists, marking it as recently used."""
+        session = self._sessions.get(session_id)
+        if session is not None:
+            now = time.monotonic()
+            if now - session.last_active > self.session_ttl:
+                del self._sessions[session_id]
+                logger.info("Expired idle session: %s", session_id)
+                return None
+            session.last_active = now
+            self._sessions.move_to_end(session_id)
+        return session
     
     def update_session(
         self,
@@ -65,11 +118,11 @@ class SessionManager:
         session = self.get_or_create_session(session_id)
         
         # Add message to history
-        session.conversation_history.append(message)
-        session.message_count = len(session.conversation_history)
+        self._append_message(session, message)
+        session.message_count += 1
         
         # Merge intelligence
-        session.extracted_intelligence = session.extracted_intelligence.merge(intelligence)
+        session.extracted_intelligence.merge(intelligence)
         
         # Update scam detection
         if scam_detected:
@@ -78,13 +131,11 @@ class SessionManager:
         
         # Add tactics
         if tactics:
-            session.scammer_tactics.extend(tactics)
-            session.scammer_tactics = list(set(session.scammer_tactics))
+            session.scammer_tactics.update(tactics)
         
         logger.info(
-            f"Updated session {session_id}: "
-            f"messages={session.message_count}, "
-            f"scam_detected={session.scam_detected}"
+            "Updated session %s: messages=%d, scam_detected=%s",
+            session_id, session.message_count, session.scam_detected
         )
         
         return session
@@ -105,13 +156,33 @@ class SessionManager:
         agent_message = Message(
             sender="agent",
             text=response_text,
-            timestamp=datetime.utcnow().isoformat()
+            timestamp=utc_now_iso()
         )
-        session.conversation_history.append(agent_message)
-        session.message_count = len(session.conversation_history)
+        self._append_message(session, agent_message)
+        session.message_count += 1
         
         return session
     
+    def _append_message(self, session: SessionData, message: Message) -> None:
+        """
+        Add a message to the session history, rolling old turns off.
+        
+        Once the history outgrows the prompt budget, the oldest messages
+        are dropped until it is halved. Prompts built from it then share
+        a stable prefix until the next roll, instead of shifting on every
+        turn as a sliding window would. The newest message is always kept.
+        """
+        history = session.conversation_history
+        history.append(message)
+        
+        kept_chars = sum(len(msg.text) for msg in history)
+        if kept_chars > self.history_budget:
+            start = 0
+            while start < len(history) - 1 and kept_chars > self.history_budget // 2:
+                kept_chars -= len(history[start].text)
+                start += 1
+            del history[:start]
+    
     def should_trigger_callback(self, session_id: str) -> bool:
         """
         Determine if we should trigger the final callback.
@@ -140,7 +211,7 @@ class SessionManager:
         
         # Maximum reached - always trigger
         if msg_count >= max_msgs:
-            logger.info(f"Session {session_id}: Max messages reached ({msg_count})")
+            logger.info("Session %s: Max messages reached (%d)", session_id, msg_count)
             return True
         
         # Minimum reached with key intelligence
@@ -148,8 +219,8 @@ class SessionManager:
             intel = session.extracted_intelligence
             if intel.has_key_intelligence():
                 logger.info(
-                    f"Session {session_id}: Min messages + key intelligence "
-                    f"(msgs={msg_count}, has_intel=True)"
+                    "Session %s: Min messages + key intelligence "
+                    "(msgs=%d, has_intel=True)", session_id, msg_count
                 )
                 return True
         
@@ -160,7 +231,61 @@ class SessionManager:
         session = self.get_session(session_id)
         if session:
             session.callback_sent = True
-            logger.info(f"Session {session_id}: Callback marked as sent")
+            logger.info("Session %s: Callback marked as sent", session_id)
+    
+    def purge_expired(self) -> int:
+        """
+        Drop sessions idle for longer than the TTL.
+        
+        Access order matches last_active order, so expired sessions are
+        all at the front and the scan stops at the first live one.
+        
+        Returns:
+            Number of sessions dropped
+        """
+        cutoff = time.monotonic() - self.session_ttl
+        purged = 0
+        while self._sessions:
+            session = next(iter(self._sessions.values()))
+            if session.last_active >= cutoff:
+                break
+            self._sessions.popitem(last=False)
+            purged += 1
+        
+        if purged:
+            logger.info("Purged %d idle session(s)", purged)
+        return purged
+    
+    def start_sweeper(self) -> None:
+        """Start the background task that periodically purges idle sessions."""
+        if self._sweeper is None:
+            self._sweeper = asyncio.create_task(self._sweep())
+    
+    async def aclose(self) -> None:
+        """Stop the sweeper task."""
+        if self._sweeper is not None:
+            self._sweeper.cancel()
+            try:
+                await self._sweeper
+            except asyncio.CancelledError:
+                pass
+            self._sweeper = None
+    
+    async def _sweep(self) -> None:
+        """Purge idle sessions every SWEEP_INTERVAL seconds."""
+        while True:
+            await asyncio.sleep(self.SWEEP_INTERVAL)
+            self.purge_expired()
+            self._drop_stale_locks()
+    
+    def _drop_stale_locks(self) -> None:
+        """Forget idle locks whose session has been removed."""
+        stale = [
+            session_id for session_id, lock in self._locks.items()
+            if session_id not in self._sessions and not lock.locked()
+        ]
+        for session_id in stale:
+            del self._locks[session_id]
     
     def get_all_sessions(self) -> Dict[str, SessionData]:
         """Get all sessions (for debugging)."""
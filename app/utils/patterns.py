@@ -1,25 +1,41 @@
 """
-Regex patterns for intelligence extraction.
+Regex patterns and keyword lists for intelligence extraction.
 """
 
 import re
-from typing import List, Pattern
+from typing import Dict, List, Optional, Pattern, Set
+import ahocorasick
 
 # =============================================================================
 # BANK ACCOUNT PATTERNS
 # =============================================================================
-# Indian bank account numbers: 9-18 digits
-BANK_ACCOUNT_PATTERN: Pattern = re.compile(
-    r'\b(\d{9,18})\b',
-    re.IGNORECASE
-)
+# Indian bank account numbers: 9-18 digits. The identifier patterns use
+# re.ASCII: only ASCII digits and letters make up accounts, phones and
+# UPI IDs, and ASCII-only \d and \b match about twice as fast
+BANK_ACCOUNT_PATTERN: Pattern = re.compile(r'\b(\d{9,18})\b', re.ASCII)
+
+# Cheap pre-check: bank account and phone patterns both need 9+ digits in a row
+DIGIT_RUN_PATTERN: Pattern = re.compile(r'\d{9}', re.ASCII)
 
 # =============================================================================
 # UPI ID PATTERNS
 # =============================================================================
-# Format: username@bankname (e.g., user@paytm, name@ybl, john@sbi)
-UPI_ID_PATTERN: Pattern = re.compile(
-    r'\b([a-zA-Z0-9._-]+@[a-zA-Z]{2,})\b',
+# Format: username@bankname (e.g., user@paytm, name@ybl, john@sbi).
+# The classes already list both cases, so no IGNORECASE (which slows
+# class matching with case folding)
+UPI_ID_PATTERN: Pattern = re.compile(r'\b([a-zA-Z0-9._-]+@[a-zA-Z]{2,})\b', re.ASCII)
+
+# Known UPI handles (the part after '@')
+KNOWN_UPI_HANDLES: List[str] = [
+    'paytm', 'ybl', 'sbi', 'okicici', 'okhdfcbank',
+    'okaxis', 'oksbi', 'upi', 'apl', 'axisbank',
+    'ibl', 'icici', 'kotak', 'indus', 'hsbc'
+]
+
+# Email providers, used to tell email addresses apart from UPI IDs
+EMAIL_DOMAINS: List[str] = ['gmail', 'yahoo', 'hotmail', 'outlook', 'mail']
+EMAIL_DOMAIN_PATTERN: Pattern = re.compile(
+    '|'.join(map(re.escape, EMAIL_DOMAINS)),
     re.IGNORECASE
 )
 
@@ -27,10 +43,7 @@ UPI_ID_PATTERN: Pattern = re.compile(
 # PHONE NUMBER PATTERNS
 # =============================================================================
 # Indian phone numbers: +91, 91, or direct 10 digits
-PHONE_PATTERN: Pattern = re.compile(
-    r'(?:\+91[\s-]?|91[\s-]?)?([6-9]\d{9})\b',
-    re.IGNORECASE
-)
+PHONE_PATTERN: Pattern = re.compile(r'(?:\+91[\s-]?|91[\s-]?)?([6-9]\d{9})\b', re.ASCII)
 
 # =============================================================================
 # URL/PHISHING LINK PATTERNS
@@ -46,6 +59,12 @@ SHORTENED_URL_PATTERN: Pattern = re.compile(
     re.IGNORECASE
 )
 
+# Full URLs or scheme-less shortened links, found in a single pass
+PHISHING_LINK_PATTERN: Pattern = re.compile(
+    f"{URL_PATTERN.pattern}|{SHORTENED_URL_PATTERN.pattern}",
+    re.IGNORECASE
+)
+
 # =============================================================================
 # SUSPICIOUS KEYWORDS
 # =============================================================================
@@ -116,3 +135,61 @@ URGENCY_KEYWORDS: List[str] = [
     "within 2 hours", "today only", "expires", "last warning",
     "final notice", "act fast", "hurry", "don't delay"
 ]
+
+# =============================================================================
+# KEYWORD AUTOMATON
+# =============================================================================
+# Every keyword list above, by category, matched in one pass by scan_keywords()
+KEYWORD_CATEGORIES: Dict[str, List[str]] = {
+    "scam": SCAM_KEYWORDS,
+    "urgency": URGENCY_KEYWORDS,
+    "bank": BANK_NAMES,
+    "authority": AUTHORITY_NAMES,
+    "threat": THREAT_KEYWORDS,
+}
+
+
+def build_keyword_automaton(categories: Dict[str, List[str]]) -> ahocorasick.Automaton:
+    """
+    Build one Aho-Corasick automaton tagging each term with its categories.
+    
+    Each match yields `(term, categories)`, with categories in the
+    order they appear in `categories`.
+    """
+    term_categories: Dict[str, List[str]] = {}
+    for category, terms in categories.items():
+        for term in terms:
+            term_categories.setdefault(term.lower(), []).append(category)
+    
+    automaton = ahocorasick.Automaton()
+    for term, categories in term_categories.items():
+        automaton.add_word(term, (term, tuple(categories)))
+    automaton.make_automaton()
+    return automaton
+
+
+KEYWORD_AUTOMATON = build_keyword_automaton(KEYWORD_CATEGORIES)
+
+
+def empty_keyword_matches() -> Dict[str, Set[str]]:
+    """Create an empty per-category result for scan_keywords()."""
+    return {category: set() for category in KEYWORD_CATEGORIES}
+
+
+def scan_keywords(
+    text_lower: str,
+    found: Optional[Dict[str, Set[str]]] = None
+) -> Dict[str, Set[str]]:
+    """
+    Find every keyword in already-lowercased text, grouped by category.
+    
+    Matches are substring-based and may overlap, like `term in text`.
+    Pass the result of an earlier call as `found` to accumulate matches
+    across several texts without concatenating them.
+    """
+    if found is None:
+        found = empty_keyword_matches()
+    for _, (term, categories) in KEYWORD_AUTOMATON.iter(text_lower):
+        for category in categories:
+            found[category].add(term)
+    return found
@@ -0,0 +1,26 @@
+"""
+Timestamp helpers for the request path.
+"""
+
+import time
+from typing import Tuple
+
+# (whole second, formatted prefix) of the last call, replaced as one tuple
+_last_second: Tuple[int, str] = (-1, "")
+
+
+def utc_now_iso() -> str:
+    """
+    Current UTC time as an ISO 8601 string, e.g. 2026-02-04T16:50:00.123456.
+
+    Same layout as datetime.utcnow().isoformat(), except microseconds
+    are always present. The date and time up to the second are formatted
+    once per second and reused, so most calls only format microseconds.
+    """
+    global _last_second
+    seconds, nanos = divmod(time.time_ns(), 1_000_000_000)
+    cached_seconds, prefix = _last_second
+    if seconds != cached_seconds:
+        prefix = time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(seconds))
+        _last_second = (seconds, prefix)
+    return f"{prefix}.{nanos // 1000:06d}"
@@ -1,55 +1,159 @@
 from fastapi import FastAPI, Request, Header, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import ORJSONResponse
+import asyncio
 import os
 import re
+import time
+from collections import OrderedDict
+from contextlib import asynccontextmanager
 import openai
+import orjson
 from datetime import datetime
+from typing import NamedTuple
 import httpx
+from app.utils.patterns import DIGIT_RUN_PATTERN, build_keyword_automaton
 
 # ================= CONFIG =================
 
 API_KEY = os.getenv("HONEYPOT_API_KEY", "my-honeypot-key")
 
-# Initialize OpenAI Client (v1.x) - ONLY if key exists
+# Initialize OpenAI Client (v1.x) - ONLY if key exists.
+# Async, so an in-flight completion doesn't block other requests
 openai_key = os.getenv("OPENAI_API_KEY")
 if openai_key:
-    client = openai.OpenAI(api_key=openai_key)
+    client = openai.AsyncOpenAI(api_key=openai_key)
 else:
     client = None  # No OpenAI - use fallback mode
 
-# ================= APP =================
+CALLBACK_URL = os.getenv("CALLBACK_URL", "https://hackathon.guvi.in/api/updateHoneyPotFinalResult")
+
+# Comma-separated browser origins allowed via CORS. Unset by default:
+# the API is called server-to-server with x-api-key, so no CORS needed.
+CORS_ORIGINS = [o.strip() for o in os.getenv("CORS_ORIGINS", "").split(",") if o.strip()]
 
-app = FastAPI(title="Agentic Honeypot API")
+# ================= APP =================
 
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=["*"],
-    allow_methods=["*"],
-    allow_headers=["*"],
-)
+# One pooled client for the app's lifetime, so callbacks reuse
+# connections instead of a fresh DNS lookup and TLS handshake each time
+callback_client = None
+callback_tasks = set()
+
+
+@asynccontextmanager
+async def lifespan(app):
+    global callback_client
+    callback_client = httpx.AsyncClient(
+        timeout=5,
+        limits=httpx.Limits(max_connections=100, max_keepalive_connections=20)
+    )
+    yield
+    # Let callbacks already in flight finish before closing the client
+    if callback_tasks:
+        await asyncio.gather(*callback_tasks, return_exceptions=True)
+    await callback_client.aclose()
+    callback_client = None
+
+
+app = FastAPI(title="Agentic Honeypot API", default_response_class=ORJSONResponse, lifespan=lifespan)
+
+if CORS_ORIGINS:
+    app.add_middleware(
+        CORSMiddleware,
+        allow_origins=CORS_ORIGINS,
+        allow_credentials=False,
+        allow_methods=["*"],
+        allow_headers=["*"],
+    )
 
 # ================= MEMORY =================
 
-sessions = {}
+# Sessions in least-recently-used order: the oldest is evicted beyond
+# MAX_SESSIONS, and any idle for SESSION_TTL_SECONDS is dropped
+MAX_SESSIONS = int(os.getenv("MAX_SESSIONS", "10000"))
+SESSION_TTL_SECONDS = int(os.getenv("SESSION_TTL_SECONDS", "3600"))
+
+# Messages kept per session for the agent prompt. History is trimmed
+# back to this once it doubles, so the prompt prefix only changes once
+# every MAX_HISTORY messages instead of sliding on every turn
+MAX_HISTORY = 20
+
+sessions = OrderedDict()
+
+
+def purge_expired_sessions(now):
+    """Drop idle sessions; they are all at the front of the LRU order."""
+    cutoff = now - SESSION_TTL_SECONDS
+    while sessions and next(iter(sessions.values()))["last_active"] < cutoff:
+        sessions.popitem(last=False)
 
 # ================= REGEX =================
 
-UPI_REGEX = r"[a-zA-Z0-9.\-_]{2,}@[a-zA-Z]{2,}"
-BANK_REGEX = r"\b\d{9,18}\b"
-URL_REGEX = r"https?://\S+"
-PHONE_REGEX = r"\+91[0-9]{10}|\b[0-9]{10}\b"
+# Compiled once at import; extract() calls the bound methods directly
+UPI_PATTERN = re.compile(r"[a-zA-Z0-9.\-_]{2,}@[a-zA-Z]{2,}")
+BANK_PATTERN = re.compile(r"\b\d{9,18}\b", re.ASCII)
+URL_PATTERN = re.compile(r"https?://\S+")
+PHONE_PATTERN = re.compile(r"\+91[0-9]{10}|\b[0-9]{10}\b", re.ASCII)
+
+# Scam keywords, matched in one pass by find_keywords()
+KEYWORDS = ["urgent", "verify", "pan", "kyc", "block", "suspend", "otp", "account"]
+KEYWORD_AUTOMATON = build_keyword_automaton({"scam": KEYWORDS})
+
+AGENT_PROMPT = """You are an Indian person.
+You believe the scammer.
+Be polite and slow.
+Try to get UPI ID, bank account, or payment link.
+Never reveal scam detection.
+Ask natural questions.
+Keep responses short and simple."""
 
 # ================= UTIL =================
 
-def extract(text):
+class Turn(NamedTuple):
+    """One history entry. A tuple is a quarter the size of a dict per message."""
+    role: str
+    content: str
+
+
+async def generate_reply(history):
+    """Ask the LLM for the agent's next reply, with a canned one on failure."""
+    try:
+        response = await client.chat.completions.create(
+            model="gpt-3.5-turbo",
+            messages=[
+                {"role": "system", "content": AGENT_PROMPT},
+                *(turn._asdict() for turn in history)
+            ]
+        )
+        return response.choices[0].message.content
+    except Exception:
+        return "Why is this happening? What should I do?"
+
+def find_keywords(text_lower):
+    """Return the KEYWORDS occurring in lowercased text, in KEYWORDS order."""
+    found = {term for _, (term, _) in KEYWORD_AUTOMATON.iter(text_lower)}
+    return [k for k in KEYWORDS if k in found]
+
+def extract(text, text_lower=None):
+    # Skip passes that cannot match: bank and phone numbers both need a
+    # run of 9+ digits, UPI IDs an '@' and links "http"
+    has_digits = DIGIT_RUN_PATTERN.search(text) is not None
     return {
-        "bankAccounts": list(set(re.findall(BANK_REGEX, text))),
-        "upiIds": list(set(re.findall(UPI_REGEX, text))),
-        "phishingLinks": list(set(re.findall(URL_REGEX, text))),
-        "phoneNumbers": list(set(re.findall(PHONE_REGEX, text))),
-        "suspiciousKeywords": [k for k in ["urgent", "verify", "pan", "kyc", "block", "suspend", "otp", "account"] if k in text.lower()]
+        "bankAccounts": list(set(BANK_PATTERN.findall(text))) if has_digits else [],
+        "upiIds": list(set(UPI_PATTERN.findall(text))) if "@" in text else [],
+        "phishingLinks": list(set(URL_PATTERN.findall(text))) if "http" in text else [],
+        "phoneNumbers": list(set(PHONE_PATTERN.findall(text))) if has_digits else [],
+        "suspiciousKeywords": find_keywords(text.lower() if text_lower is None else text_lower)
     }
 
+async def send_callback(session_id, payload):
+    """Post the final result; runs as a background task."""
+    try:
+        await callback_client.post(CALLBACK_URL, json=payload)
+        print(f"✅ Final callback sent for session {session_id}")
+    except Exception as e:
+        print(f"❌ Callback failed: {e}")
+
 # ================= ROOT =================
 
 @app.head("/")
@@ -66,7 +170,7 @@ async def honeypot(request: Request, x_api_key: str = Header(None)):
         raise HTTPException(status_code=401, detail="Unauthorized")
 
     try:
-        body = await request.json()
+        body = orjson.loads(await request.body())
     except Exception:
         body = {}
 
@@ -86,36 +190,58 @@ async def honeypot(request: Request, x_api_key: str = Header(None)):
         message_text = message_obj.get("text", "")
     else:
         message_text = str(message_obj)
+    message_lower = message_text.lower()
     
     # Get conversation history
     conversation_history = body.get("conversationHistory", [])
 
+    now = time.monotonic()
+    purge_expired_sessions(now)
+
     # Initialize session if new
-    if session_id not in sessions:
+    if session_id in sessions:
+        sessions.move_to_end(session_id)
+    else:
         sessions[session_id] = {
             "history": [],
             "turns": 0,
             "intel": {
-                "bankAccounts": [],
-                "upiIds": [],
-                "phishingLinks": [],
-                "phoneNumbers": [],
-                "suspiciousKeywords": []
+                "bankAccounts": set(),
+                "upiIds": set(),
+                "phishingLinks": set(),
+                "phoneNumbers": set(),
+                "suspiciousKeywords": set()
             }
         }
+        if len(sessions) > MAX_SESSIONS:
+            sessions.popitem(last=False)
 
     session = sessions[session_id]
+    session["last_active"] = now
 
     # Add scammer message to history
-    session["history"].append({"role": "user", "content": message_text})
+    session["history"].append(Turn("user", message_text))
+    if len(session["history"]) > 2 * MAX_HISTORY:
+        del session["history"][:-MAX_HISTORY]
 
     # ================= SCAM DETECTION =================
 
     scam_detected = False
-    if client:
+    agent_task = None
+
+    # Short messages with no scam keyword, account, UPI ID, link or phone
+    # number ("hi", "ok thanks") are small talk: skip the LLM round trips
+    signals = extract(message_text, message_lower)
+    likely_benign = len(message_text) < 40 and not any(signals.values())
+
+    if client and not likely_benign:
+        # Nearly all traffic to a honeypot is scams, so request the agent
+        # reply alongside detection instead of after it, and cancel it if
+        # the message turns out to be harmless
+        agent_task = asyncio.create_task(generate_reply(list(session["history"])))
         try:
             detect_prompt = f"Reply only YES or NO. Is this a scam message?\n\nMessage:\n{message_text}"
-            detect = client.chat.completions.create(
+            detect = await client.chat.completions.create(
                 model="gpt-3.5-turbo",
                 messages=[{"role": "user", "content": detect_prompt}]
             )
@@ -123,35 +249,19 @@ async def honeypot(request: Request, x_api_key: str = Header(None)):
         except Exception as e:
             print(f"OpenAI Error: {e}")
             scam_detected = True  # Fail safe
-    else:
+        if not scam_detected:
+            agent_task.cancel()
+    elif not client:
         # Simple keyword fallback
-        scam_detected = any(k in message_text.lower() for k in ["urgent", "verify", "pan", "kyc", "block", "suspend", "otp", "account"])
+        scam_detected = bool(find_keywords(message_lower))
 
     reply = "Okay."
 
     # ================= AGENT =================
 
     if scam_detected:
-        agent_prompt = """You are an Indian person.
-You believe the scammer.
-Be polite and slow.
-Try to get UPI ID, bank account, or payment link.
-Never reveal scam detection.
-Ask natural questions.
-Keep responses short and simple."""
-        
-        if client:
-            try:
-                response = client.chat.completions.create(
-                    model="gpt-3.5-turbo",
-                    messages=[
-                        {"role": "system", "content": agent_prompt},
-                        *session["history"]
-                    ]
-                )
-                reply = response.choices[0].message.content
-            except Exception:
-                reply = "Why is this happening? What should I do?"
+        if agent_task:
+            reply = await agent_task
         else:
             # Fallback responses
             replies = [
@@ -162,36 +272,30 @@ Keep responses short and simple."""
             ]
             reply = replies[session["turns"] % len(replies)]
 
-        session["history"].append({"role": "assistant", "content": reply})
+        session["history"].append(Turn("assistant", reply))
         session["turns"] += 1
 
         # Extract intelligence
-        intel = extract(message_text + " " + reply)
+        intel = extract(message_text + " " + reply, message_lower + " " + reply.lower())
         for k in intel:
-            session["intel"][k].extend(intel[k])
-            session["intel"][k] = list(set(session["intel"][k]))
+            session["intel"][k].update(intel[k])
 
         # ================= FINAL CALLBACK =================
         # Send callback after sufficient engagement (8+ turns)
         if session["turns"] >= 8:
-            try:
-                callback_payload = {
-                    "sessionId": session_id,
-                    "scamDetected": True,
-                    "totalMessagesExchanged": session["turns"],
-                    "extractedIntelligence": session["intel"],
-                    "agentNotes": f"Scammer engaged for {session['turns']} turns. Intelligence extracted."
-                }
-                
-                async with httpx.AsyncClient() as http_client:
-                    await http_client.post(
-                        "https://hackathon.guvi.in/api/updateHoneyPotFinalResult",
-                        json=callback_payload,
-                        timeout=5
-                    )
-                print(f"✅ Final callback sent for session {session_id}")
-            except Exception as e:
-                print(f"❌ Callback failed: {e}")
+            callback_payload = {
+                "sessionId": session_id,
+                "scamDetected": True,
+                "totalMessagesExchanged": session["turns"],
+                "extractedIntelligence": {k: sorted(v) for k, v in session["intel"].items()},
+                "agentNotes": f"Scammer engaged for {session['turns']} turns. Intelligence extracted."
+            }
+
+            # Fire and forget, so the reply isn't held up by the callback;
+            # the set keeps a reference until the task finishes
+            task = asyncio.create_task(send_callback(session_id, callback_payload))
+            callback_tasks.add(task)
+            task.add_done_callback(callback_tasks.discard)
 
     # ================= RESPONSE (HACKATHON FORMAT) =================
     
@@ -211,7 +315,7 @@ async def events(request: Request, x_api_key: str = Header(None)):
         raise HTTPException(status_code=401, detail="Unauthorized")
     
     try:
-        body = await request.json()
+        body = orjson.loads(await request.body())
     except Exception:
         body = {}
     